@@ -2,6 +2,18 @@ import os
 import subprocess
 import re
 import sys
+import hashlib
+import json
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+_RESOURCE_RE = re.compile(rb'resource\s+"(\w+)"\s+"(\w+)"\s*\{')
+
+# The scan cache is opt-in, for local runs over large trees: set VERSION_DETERMINATOR_CACHE=1.
+# Bump the version when the parsed resource format, the hash scheme or the scanned paths change.
+_SCAN_CACHE_ENABLED = os.environ.get('VERSION_DETERMINATOR_CACHE') == '1'
+_SCAN_CACHE_VERSION = 4
+_SCAN_CACHE_DIR = os.path.join(os.environ.get('XDG_CACHE_HOME', os.path.expanduser('~/.cache')), 'version_determinator')
 
 def get_latest_tag():
     """
@@ -18,372 +30,623 @@ def get_latest_tag():
         print("No Git tags found.")
         return None
 
-def get_changed_files(latest_tag):
+def iter_git_output(args):
+    """
+    Run a git command and yield its output line by line as it is produced.
+
+    Args:
+        args (list): The git arguments, without the leading 'git'.
+
+    Yields:
+        str: Each line of output, without the trailing newline.
+
+    Raises:
+        subprocess.CalledProcessError: If the git command exits with a non-zero status.
+    """
+    with subprocess.Popen(['git', *args], stdout=subprocess.PIPE, text=True) as process:
+        for line in process.stdout:
+            yield line.rstrip('\n')
+    if process.returncode:
+        raise subprocess.CalledProcessError(process.returncode, process.args)
+
+def get_directory_prefix(config_directory):
+    """
+    Get the prefix of paths inside the configuration directory as git reports them,
+    normalised and with '/' separators.
+
+    Args:
+        config_directory (str): The directory containing Terraform configurations.
+
+    Returns:
+        str: The directory prefix, ending in '/', or an empty string for the current directory.
     """
-    Get a list of files changed since the latest tag or all files if no tag exists.
+    normalised_directory = os.path.normpath(config_directory).replace(os.sep, '/')
+    return '' if normalised_directory == '.' else normalised_directory + '/'
+
+def get_changed_tf_files(latest_tag, config_directory):
+    """
+    Get the Terraform files in the configuration directory changed since the latest tag,
+    or all tracked Terraform files there if no tag exists. Only files the directory
+    scan reads are included, so the version bump and the config hash cover the same files.
     Handles renamed files gracefully.
 
     Args:
         latest_tag (str): The latest Git tag, or None if no tags exist.
+        config_directory (str): The directory containing Terraform configurations.
 
     Returns:
-        list: A list of changed file paths.
+        dict: A dictionary mapping each changed .tf file path to its git status letter
+            (A, C, M, R or T). Files listed without a tag are reported as added.
     """
+    # Build the directory prefix once rather than per file
+    directory_prefix = get_directory_prefix(config_directory)
+
     if latest_tag:
         try:
-            # Use --diff-filter=ACMRT to include only added, copied, modified, renamed, or type-changed files
-            files = subprocess.check_output(['git', 'diff', '--name-status', '--diff-filter=ACMRT', latest_tag, 'HEAD']).decode().split('\n')
-            print(f"Files changed since {latest_tag}:")
-            changed_files = []
-            for file in files:
-                if file:
-                    status, *paths = file.split('\t')
-                    if status.startswith('R'):  # Renamed file
-                        print(f"  - Renamed: {paths[0]} -> {paths[1]}")
-                        changed_files.append(paths[1])  # Add the new filename
-                    else:
-                        print(f"  - {paths[0]}")
-                        changed_files.append(paths[0])
+            print(f"Terraform files changed since {latest_tag}:")
+            changed_files = {}
+            # Use --diff-filter=ACMRT to include only added, copied, modified, renamed, or type-changed files,
+            # and a pathspec so git only reports files in the configuration directory
+            for line in iter_git_output(['diff', '--name-status', '--diff-filter=ACMRT', latest_tag, 'HEAD', '--', config_directory]):
+                status, *paths = line.split('\t')
+                file = paths[-1]  # The new filename for renamed or copied files
+                if not (file.startswith(directory_prefix) and is_scanned_tf_path(file[len(directory_prefix):])):
+                    continue
+                if status.startswith('R'):  # Renamed file
+                    print(f"  - Renamed: {paths[0]} -> {file}")
+                else:
+                    print(f"  - {file}")
+                changed_files[file] = status[0]  # Drop the similarity score from R/C statuses
             return changed_files
         except subprocess.CalledProcessError:
             print("Error: Unable to get changed files. Using all files instead.")
-    
+
     # If no tag exists or there's an error, return all tracked files
-    files = subprocess.check_output(['git', 'ls-files']).decode().split('\n')
-    print("No previous tag found or error occurred. Using all tracked files:")
-    return [file for file in files if file]
+    print("No previous tag found or error occurred. Using all tracked Terraform files.")
+    return {file: 'A' for file in iter_git_output(['ls-files', '--', config_directory]) if file.startswith(directory_prefix) and is_scanned_tf_path(file[len(directory_prefix):])}
 
-def file_exists(file_path):
+class GitCatFileBatch:
+    """
+    Read file contents from Git objects through a single long-running
+    `git cat-file --batch` process, instead of spawning one git process per file.
     """
-    Check if a file exists.
+
+    def __init__(self):
+        self.process = subprocess.Popen(['git', 'cat-file', '--batch'], stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """
+        Close the input stream and wait for the git process to exit.
+        """
+        self.process.stdin.close()
+        self.process.stdout.close()
+        self.process.wait()
+
+    def read(self, revision, file_path):
+        """
+        Read the raw content of a file at the given revision.
+
+        Args:
+            revision (str): The Git revision to read from, e.g. a tag or HEAD.
+            file_path (str): The path of the file relative to the repository root.
+
+        Returns:
+            bytes: The content of the file, or empty bytes if the file doesn't exist at the revision.
+        """
+        self.process.stdin.write(f'{revision}:{file_path}\n'.encode())
+        self.process.stdin.flush()
+        header_line = self.process.stdout.readline()
+        # Missing objects are reported as '<object> missing', which may itself contain spaces
+        if header_line.endswith((b' missing\n', b' ambiguous\n')):
+            print(f"Warning: File {file_path} does not exist at {revision}. Skipping.")
+            return b""
+        header = header_line.split()
+
+        content = self.process.stdout.read(int(header[2]))
+        self.process.stdout.read(1)  # Trailing newline after the object content
+        if header[1] != b'blob':
+            # The body is consumed above either way so later reads stay in step
+            print(f"Warning: {file_path} at {revision} is a {header[1].decode()}, not a file. Skipping.")
+            return b""
+        return content
+
+def make_resource(fields):
+    """
+    Build a parsed resource entry from its fields.
 
     Args:
-        file_path (str): The path to the file.
+        fields (dict): The resource's field names and values.
 
     Returns:
-        bool: True if the file exists, False otherwise.
+        dict: The fields and a frozenset of the field names, so field sets can
+            be compared without rebuilding them.
     """
-    return os.path.isfile(file_path)
+    return {'fields': fields, 'keyset': frozenset(fields)}
 
-def read_file_content(file_path):
+def parse_resource(content):
     """
-    Read the content of a file with UTF-8 encoding.
+    Parse Terraform resource blocks from the given content.
 
     Args:
-        file_path (str): The path to the file.
+        content (bytes): The raw content of a Terraform file.
 
     Returns:
-        str: The content of the file, or an empty string if the file doesn't exist.
+        dict: A dictionary mapping (type, name) tuples to the resource's 'fields'
+            dictionary and the precomputed 'keyset' frozenset of its field names.
+    """
+    fields_by_resource = {}
+    current_resource = None
+    match_resource = _RESOURCE_RE.match
+    for line in content.splitlines():
+        # Only resource header lines can match, so skip the regex for everything else
+        resource_match = match_resource(line) if line.startswith(b'resource') else None
+        if resource_match:
+            # Labels are ASCII identifiers; other text is decoded only when stored
+            current_resource = (resource_match.group(1).decode('ascii'), resource_match.group(2).decode('ascii'))
+            fields_by_resource[current_resource] = {}
+        elif current_resource and b'=' in line:
+            field, value = line.split(b'=', 1)
+            fields_by_resource[current_resource][field.strip().decode('utf-8', 'replace')] = value.strip().rstrip(b',').decode('utf-8', 'replace')
+        elif line.strip() == b'}':
+            current_resource = None
+    return {resource: make_resource(fields) for resource, fields in fields_by_resource.items()}
 
-    Raises:
-        UnicodeDecodeError: If the file cannot be decoded using UTF-8.
+def _is_skipped_directory(name):
+    """
+    Check whether a directory is left out of the scan. Hidden directories such
+    as .terraform and .git, and vendored trees, are skipped.
+
+    Args:
+        name (str): The directory name.
+
+    Returns:
+        bool: True if the directory is skipped, False otherwise.
+    """
+    return name.startswith('.') or name == 'vendor'
+
+def is_scanned_tf_path(relative_path):
+    """
+    Check whether a path is a Terraform file the directory scan reads.
+
+    Args:
+        relative_path (str): The path relative to the configuration directory, with '/' separators.
+
+    Returns:
+        bool: True if the path is a .tf file outside skipped directories, False otherwise.
+    """
+    *directories, name = relative_path.split('/')
+    return name.endswith('.tf') and not any(_is_skipped_directory(directory) for directory in directories)
+
+def _iter_tf_files(root):
+    """
+    Recursively yield the paths of Terraform files under a directory,
+    skipping hidden and vendor directories.
+
+    Args:
+        root (str): The directory to traverse.
+
+    Yields:
+        str: The path of each .tf file found.
+    """
+    with os.scandir(root) as it:
+        entries = sorted(it, key=lambda entry: entry.name)  # Sort entries for a consistent hash
+    for entry in entries:
+        # Test the name first; it is a pure string check and needs no stat
+        if entry.name.endswith('.tf') and entry.is_file(follow_symlinks=False):
+            yield entry.path
+        elif not _is_skipped_directory(entry.name) and entry.is_dir(follow_symlinks=False):
+            yield from _iter_tf_files(entry.path)
+
+def log_resources(resources):
+    """
+    Print the resources found in a parsed Terraform file.
+
+    Args:
+        resources (dict): A dictionary mapping (type, name) tuples to parsed resources.
+    """
+    for resource_type, resource_name in resources:
+        print(f"Found resource: {resource_type} '{resource_name}'")
+
+def _read_and_parse(file_path):
+    """
+    Read a Terraform file and parse its resources. This runs on worker threads,
+    so it does not log; scan_directory reports the results in path order.
+
+    Args:
+        file_path (str): The path to the file.
+
+    Returns:
+        tuple: The raw content of the file, its parsed resources, and the error
+            raised while reading it, or None.
     """
-    if not file_exists(file_path):
-        print(f"Warning: File {file_path} does not exist. Skipping.")
-        return ""
-    
     try:
-        with open(file_path, 'r', encoding='utf-8') as file:
+        with open(file_path, 'rb') as file:
             content = file.read()
-        print(f"Successfully read content from {file_path}")
-        return content
-    except UnicodeDecodeError:
-        print(f"Error: Unable to decode file {file_path} with UTF-8 encoding.")
-        return ""
     except IOError as e:
-        print(f"Error: Unable to read file {file_path}. {str(e)}")
-        return ""
+        return b"", {}, e
+    return content, parse_resource(content), None
 
-def parse_resource(content):
+def scan_directory(config_directory):
     """
-    Parse Terraform resource blocks from the given content.
+    Parse every Terraform file in the configuration directory once, hashing
+    the raw file bytes as they are read. Files are hashed in the order
+    _iter_tf_files yields them: entries sorted by name within each directory,
+    with hidden and vendor directories skipped.
 
     Args:
-        content (str): The content of a Terraform file.
+        config_directory (str): The directory containing Terraform configurations.
 
     Returns:
-        dict: A dictionary of resources, their types, names, and fields.
+        tuple: A dictionary mapping (type, name) tuples to parsed resources, and
+            the first 8 characters of the SHA256 hash of all .tf files.
     """
-    resources = {}
-    current_resource = None
-    for line in content.split('\n'):
-        resource_match = re.match(r'resource\s+"(\w+)"\s+"(\w+)"\s*{', line)
-        if resource_match:
-            current_resource = (resource_match.group(1), resource_match.group(2))
-            resources[current_resource] = {}
-            print(f"Found resource: {current_resource[0]} '{current_resource[1]}'")
-        elif current_resource and '=' in line:
-            field, value = map(str.strip, line.split('=', 1))
-            resources[current_resource][field] = value.rstrip(',')
-        elif line.strip() == '}':
-            current_resource = None
-    return resources
+    existing_resources = {}
+    sha256 = hashlib.sha256()
+    file_paths = list(_iter_tf_files(config_directory))
+    # Files are read and parsed in parallel; results are logged and merged in path order
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        for file_path, (content, resources, error) in zip(file_paths, executor.map(_read_and_parse, file_paths)):
+            if error:
+                print(f"Error: Unable to read file {file_path}. {str(error)}")
+                continue
+            print(f"Successfully read content from {file_path}")
+            log_resources(resources)
+            sha256.update(content)
+            existing_resources.update(resources)
+    return existing_resources, sha256.hexdigest()[:8]
+
+def has_local_tf_changes(config_directory):
+    """
+    Check whether any file the scan reads has uncommitted changes, or is untracked
+    or ignored. Files outside the scan, such as those under .terraform, are not considered.
 
-def is_new_resource_type(changed_files, config_directory):
+    Args:
+        config_directory (str): The directory containing Terraform configurations.
+
+    Returns:
+        bool: True if a scanned file differs from HEAD, False otherwise.
+
+    Raises:
+        subprocess.CalledProcessError: If git status fails.
     """
-    Check if any new resource type is introduced in the changed files.
+    directory_prefix = get_directory_prefix(config_directory)
+    # A '*' pathspec also matches across '/', so this limits git to .tf files at any depth
+    status = subprocess.check_output(['git', 'status', '--porcelain', '-z', '--untracked-files=all', '--ignored', '--', f'{directory_prefix}*.tf'], stderr=subprocess.DEVNULL).decode()
+    entries = iter(status.split('\0'))
+    for entry in entries:
+        if not entry:
+            continue
+        paths = [entry[3:]]
+        if 'R' in entry[:2] or 'C' in entry[:2]:
+            paths.append(next(entries, ''))  # The original path of a rename or copy
+        if any(path.startswith(directory_prefix) and is_scanned_tf_path(path[len(directory_prefix):]) for path in paths):
+            return True
+    return False
+
+def get_tree_sha(config_directory):
+    """
+    Get the Git tree SHA of the configuration directory at HEAD, provided none of
+    the files the scan reads have local changes, which would make a cached result stale.
 
     Args:
-        changed_files (list): List of changed file paths.
         config_directory (str): The directory containing Terraform configurations.
 
     Returns:
-        bool: True if a new resource type is found, False otherwise.
+        str: The tree SHA, or None if it cannot be determined or the directory has local changes.
     """
-    existing_resources = set()
-    new_resources = set()
+    try:
+        if has_local_tf_changes(config_directory):
+            print("Configuration directory has local changes. Skipping scan cache.")
+            return None
+        return subprocess.check_output(['git', 'rev-parse', f'HEAD:./{config_directory}'], stderr=subprocess.DEVNULL).decode().strip()
+    except subprocess.CalledProcessError:
+        print("Unable to determine the configuration tree SHA. Skipping scan cache.")
+        return None
 
-    print("Checking for new resource types:")
-    for root, _, files in os.walk(config_directory):
-        for file in files:
-            if file.endswith('.tf'):
-                content = read_file_content(os.path.join(root, file))
-                resources = parse_resource(content)
-                existing_resources.update(resource[0] for resource in resources)
-    print(f"Existing resource types: {', '.join(existing_resources)}")
+def _scan_cache_path(tree_sha):
+    """
+    Get the cache file path for a configuration tree.
 
-    for file in changed_files:
-        if file.endswith('.tf') and file.startswith(config_directory):
-            content = read_file_content(file)
-            resources = parse_resource(content)
-            new_resources.update(resource[0] for resource in resources)
-    print(f"Resource types in changed files: {', '.join(new_resources)}")
-
-    new_resource_types = new_resources - existing_resources
-    if new_resource_types:
-        print(f"New resource type(s) found: {', '.join(new_resource_types)}")
-        return True
-    else:
-        print("No new resource types found.")
-        return False
+    Args:
+        tree_sha (str): The Git tree SHA of the configuration directory.
 
-def is_new_resource_iteration(changed_files, config_directory):
+    Returns:
+        str: The path of the cache file.
     """
-    Check if a new iteration of an existing resource type is introduced.
+    return os.path.join(_SCAN_CACHE_DIR, f'{tree_sha}-v{_SCAN_CACHE_VERSION}.json')
+
+def load_cached_scan(tree_sha):
+    """
+    Load a previously cached directory scan.
+
+    Args:
+        tree_sha (str): The Git tree SHA of the configuration directory.
+
+    Returns:
+        tuple: The cached resources and config hash, or None if there is no usable cache entry.
+    """
+    cache_path = _scan_cache_path(tree_sha)
+    try:
+        with open(cache_path, 'r', encoding='utf-8') as fh:
+            cached = json.load(fh)
+        existing_resources = {(resource_type, resource_name): make_resource(fields) for resource_type, resource_name, fields in cached['resources']}
+        print(f"Loaded cached scan for tree {tree_sha}")
+        return existing_resources, cached['config_hash']
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        print(f"Warning: Ignoring unreadable scan cache {cache_path}. {str(e)}")
+        return None
+
+def save_cached_scan(tree_sha, existing_resources, config_hash):
+    """
+    Atomically write a directory scan to the cache.
+
+    Args:
+        tree_sha (str): The Git tree SHA of the configuration directory.
+        existing_resources (dict): Resources parsed from the configuration directory.
+        config_hash (str): The configuration hash.
+    """
+    cache_path = _scan_cache_path(tree_sha)
+    cached = {
+        'config_hash': config_hash,
+        'resources': [[resource_type, resource_name, resource['fields']] for (resource_type, resource_name), resource in existing_resources.items()]
+    }
+    temp_path = None
+    try:
+        os.makedirs(_SCAN_CACHE_DIR, exist_ok=True)
+        with tempfile.NamedTemporaryFile('w', encoding='utf-8', dir=_SCAN_CACHE_DIR, delete=False) as fh:
+            temp_path = fh.name
+            json.dump(cached, fh)
+        os.replace(temp_path, cache_path)
+    except (OSError, TypeError, ValueError) as e:
+        print(f"Warning: Unable to write scan cache {cache_path}. {str(e)}")
+        if temp_path and os.path.exists(temp_path):
+            os.remove(temp_path)
+
+def scan_directory_cached(config_directory):
+    """
+    Scan the configuration directory, reusing a cached result for the same Git tree
+    when the cache is enabled with VERSION_DETERMINATOR_CACHE=1.
 
     Args:
-        changed_files (list): List of changed file paths.
         config_directory (str): The directory containing Terraform configurations.
 
     Returns:
-        bool: True if a new iteration is found, False otherwise.
+        tuple: A dictionary mapping (type, name) tuples to parsed resources, and the config hash.
     """
-    existing_resources = {}
-    new_resources = {}
+    if not _SCAN_CACHE_ENABLED:
+        return scan_directory(config_directory)
 
-    print("Checking for new resource iterations:")
-    for root, _, files in os.walk(config_directory):
-        for file in files:
-            if file.endswith('.tf'):
-                content = read_file_content(os.path.join(root, file))
-                for (resource_type, resource_name), _ in parse_resource(content).items():
-                    existing_resources.setdefault(resource_type, set()).add(resource_name)
-    print("Existing resources:")
-    for resource_type, names in existing_resources.items():
-        print(f"  {resource_type}: {', '.join(names)}")
+    tree_sha = get_tree_sha(config_directory)
+    if tree_sha:
+        cached = load_cached_scan(tree_sha)
+        if cached:
+            return cached
 
-    for file in changed_files:
-        if file.endswith('.tf') and file.startswith(config_directory):
-            content = read_file_content(file)
-            for (resource_type, resource_name), _ in parse_resource(content).items():
-                new_resources.setdefault(resource_type, set()).add(resource_name)
-    print("Resources in changed files:")
-    for resource_type, names in new_resources.items():
-        print(f"  {resource_type}: {', '.join(names)}")
+    existing_resources, config_hash = scan_directory(config_directory)
+    if tree_sha:
+        save_cached_scan(tree_sha, existing_resources, config_hash)
+    return existing_resources, config_hash
 
-    for resource_type, new_names in new_resources.items():
-        if resource_type in existing_resources:
-            new_iterations = new_names - existing_resources[resource_type]
-            if new_iterations:
-                print(f"New iteration(s) found for {resource_type}: {', '.join(new_iterations)}")
-                return True
+def parse_changed_files(changed_files, git_objects):
+    """
+    Parse the changed Terraform files as committed at HEAD.
 
-    print("No new resource iterations found.")
-    return False
+    Args:
+        changed_files (dict): Changed .tf file paths, as returned by get_changed_tf_files.
+        git_objects (GitCatFileBatch): Reader used to fetch file contents from Git.
 
-def is_field_changed(changed_files, config_directory):
+    Returns:
+        dict: A dictionary mapping each changed file path to its parsed resources.
     """
-    Check if any fields have been added or removed from existing resources.
+    changed_resources = {}
+    for file in changed_files:
+        changed_resources[file] = parse_resource(git_objects.read('HEAD', file))
+        log_resources(changed_resources[file])
+    return changed_resources
+
+def merge_resources(changed_resources):
+    """
+    Merge per-file parsed resources into a single resource map.
 
     Args:
-        changed_files (list): List of changed file paths.
-        config_directory (str): The directory containing Terraform configurations.
+        changed_resources (dict): A dictionary mapping file paths to parsed resources.
 
     Returns:
-        bool: True if fields have changed, False otherwise.
+        dict: A dictionary mapping (type, name) tuples to parsed resources.
     """
-    existing_resources = {}
     new_resources = {}
+    for resources in changed_resources.values():
+        new_resources.update(resources)
+    return new_resources
 
-    print("Checking for field changes in existing resources:")
-    for root, _, files in os.walk(config_directory):
-        for file in files:
-            if file.endswith('.tf'):
-                content = read_file_content(os.path.join(root, file))
-                existing_resources.update(parse_resource(content))
-    print("Existing resource fields:")
-    for resource, fields in existing_resources.items():
-        print(f"  {resource[0]} '{resource[1]}': {', '.join(fields.keys())}")
+def is_new_resource_type(existing_resources, new_resources):
+    """
+    Check if any new resource type is introduced in the changed files.
 
-    for file in changed_files:
-        if file.endswith('.tf') and file.startswith(config_directory):
-            content = read_file_content(file)
-            new_resources.update(parse_resource(content))
-    print("Resource fields in changed files:")
-    for resource, fields in new_resources.items():
-        print(f"  {resource[0]} '{resource[1]}': {', '.join(fields.keys())}")
-
-    for resource, new_fields in new_resources.items():
-        if resource in existing_resources:
-            if set(new_fields.keys()) != set(existing_resources[resource].keys()):
-                added = set(new_fields.keys()) - set(existing_resources[resource].keys())
-                removed = set(existing_resources[resource].keys()) - set(new_fields.keys())
-                print(f"Fields changed for {resource[0]} '{resource[1]}':")
-                if added:
-                    print(f"  Added: {', '.join(added)}")
-                if removed:
-                    print(f"  Removed: {', '.join(removed)}")
-                return True
+    Args:
+        existing_resources (dict): Resources parsed from the configuration directory.
+        new_resources (dict): Resources parsed from the changed files.
+
+    Returns:
+        bool: True if a new resource type is found, False otherwise.
+    """
+    print("Checking for new resource types:")
+    existing_types = {resource[0] for resource in existing_resources}
+    print(f"Existing resource types: {', '.join(existing_types)}")
+
+    new_type = next((resource_type for resource_type, _ in new_resources if resource_type not in existing_types), None)
+    if new_type:
+        print(f"New resource type found: {new_type}")
+        return True
 
-    print("No field changes found in existing resources.")
+    print("No new resource types found.")
     return False
 
-def is_field_value_changed(changed_files, config_directory):
+def is_new_resource_iteration(existing_resources, new_resources):
     """
-    Check if any field values have changed in existing resources.
+    Check if a new iteration of an existing resource type is introduced.
 
     Args:
-        changed_files (list): List of changed file paths.
-        config_directory (str): The directory containing Terraform configurations.
+        existing_resources (dict): Resources parsed from the configuration directory.
+        new_resources (dict): Resources parsed from the changed files.
 
     Returns:
-        bool: True if field values have changed, False otherwise.
+        bool: True if a new iteration is found, False otherwise.
     """
-    existing_resources = {}
-    new_resources = {}
+    existing_names = {}
 
-    print("Checking for field value changes in existing resources:")
-    for root, _, files in os.walk(config_directory):
-        for file in files:
-            if file.endswith('.tf'):
-                content = read_file_content(os.path.join(root, file))
-                existing_resources.update(parse_resource(content))
-    print("Existing resource field values:")
-    for resource, fields in existing_resources.items():
-        print(f"  {resource[0]} '{resource[1]}':")
-        for field, value in fields.items():
-            print(f"    {field} = {value}")
+    print("Checking for new resource iterations:")
+    for resource_type, resource_name in existing_resources:
+        existing_names.setdefault(resource_type, set()).add(resource_name)
+    print("Existing resources:")
+    for resource_type, names in existing_names.items():
+        print(f"  {resource_type}: {', '.join(names)}")
 
-    for file in changed_files:
-        if file.endswith('.tf') and file.startswith(config_directory):
-            content = read_file_content(file)
-            new_resources.update(parse_resource(content))
-    print("Resource field values in changed files:")
-    for resource, fields in new_resources.items():
-        print(f"  {resource[0]} '{resource[1]}':")
-        for field, value in fields.items():
-            print(f"    {field} = {value}")
-
-    for resource, new_fields in new_resources.items():
-        if resource in existing_resources:
-            for field, value in new_fields.items():
-                if field in existing_resources[resource] and value != existing_resources[resource][field]:
-                    print(f"Field value changed for {resource[0]} '{resource[1]}':")
-                    print(f"  {field}: '{existing_resources[resource][field]}' -> '{value}'")
-                    return True
+    for resource_type, resource_name in new_resources:
+        if resource_type in existing_names and resource_name not in existing_names[resource_type]:
+            print(f"New iteration found for {resource_type}: {resource_name}")
+            return True
 
-    print("No field value changes found in existing resources.")
+    print("No new resource iterations found.")
     return False
 
-def determine_version_increment(config_directory):
-    latest_tag = get_latest_tag()
-    changed_files = get_changed_files(latest_tag)
+def check_changes(existing_resources, changed_resources):
+    """
+    Check existing resources in the changed files for added or removed fields
+    and for changed field values, in a single pass that stops at the first change.
+
+    Args:
+        existing_resources (dict): Resources parsed from the configuration directory.
+        changed_resources (dict): A dictionary mapping changed file paths to parsed resources.
+
+    Returns:
+        tuple: Whether fields have changed, and whether field values have changed.
+            At most one of the two is True, as the pass stops once either is found.
+    """
+    print("Checking for field and field value changes in existing resources:")
+    for resources in changed_resources.values():
+        for resource, new in resources.items():
+            existing = existing_resources.get(resource)
+            if existing is None:
+                continue
+            new_fields = new['fields']
+            existing_fields = existing['fields']
+
+            if new['keyset'] != existing['keyset']:
+                added = new['keyset'] - existing['keyset']
+                removed = existing['keyset'] - new['keyset']
+                print(f"Fields changed for {resource[0]} '{resource[1]}':")
+                if added:
+                    print(f"  Added: {', '.join(added)}")
+                if removed:
+                    print(f"  Removed: {', '.join(removed)}")
+                return True, False
+
+            for field, value in new_fields.items():
+                if field in existing_fields and value != existing_fields[field]:
+                    print(f"Field value changed for {resource[0]} '{resource[1]}':")
+                    print(f"  {field}: '{existing_fields[field]}' -> '{value}'")
+                    return False, True
+
+    print("No field or field value changes found in existing resources.")
+    return False, False
 
+def determine_version_increment(config_directory, latest_tag, existing_resources):
     if not latest_tag:
         print("No existing tags found. Treating as initial major version.")
         return 'major'
 
+    changed_files = get_changed_tf_files(latest_tag, config_directory)
+    if not changed_files:
+        print("No Terraform files changed. Defaulting to patch increment.")
+        return 'patch'
+
     print("\nEvaluating changes for version increment:")
-    
-    changes = {
-        'major': False,
-        'minor': False,
-        'patch': False
-    }
 
-    if is_new_resource_type(changed_files, config_directory):
-        changes['major'] = True
-    if is_new_resource_iteration(changed_files, config_directory):
-        changes['minor'] = True
-    if is_file_added_or_renamed(changed_files, config_directory):
-        changes['minor'] = True
-    if is_resource_removed_or_commented(changed_files, config_directory):
-        changes['minor'] = True
-    if is_field_changed(changed_files, config_directory):
-        changes['patch'] = True
-    if is_field_value_changed(changed_files, config_directory):
-        changes['patch'] = True
-
-    if changes['major']:
-        print("Major version increment: Significant changes detected.")
-        return 'major'
-    elif changes['minor']:
-        print("Minor version increment: Notable changes detected.")
-        return 'minor'
-    elif changes['patch']:
-        print("Patch version increment: Small changes detected.")
-        return 'patch'
-    else:
+    with GitCatFileBatch() as git_objects:
+        changed_resources = parse_changed_files(changed_files, git_objects)
+        new_resources = merge_resources(changed_resources)
+
+        # Checks run from the largest increment down and stop at the first match
+        if is_new_resource_type(existing_resources, new_resources):
+            print("Major version increment: Significant changes detected.")
+            return 'major'
+
+        if (is_new_resource_iteration(existing_resources, new_resources)
+                or is_file_added_or_renamed(changed_files)
+                or is_resource_removed_or_commented(changed_resources, latest_tag, git_objects)):
+            print("Minor version increment: Notable changes detected.")
+            return 'minor'
+
+        if any(check_changes(existing_resources, changed_resources)):
+            print("Patch version increment: Small changes detected.")
+            return 'patch'
+
         print("No changes detected. Defaulting to patch increment.")
         return 'patch'
 
-def is_file_added_or_renamed(changed_files, config_directory):
+def is_file_added_or_renamed(changed_files):
     print("Checking for added or renamed files:")
-    for file in changed_files:
-        if file.endswith('.tf') and file.startswith(config_directory):
-            print(f"  New or renamed file detected: {file}")
-            return True
+    # Every changed Terraform file counts here, as it always has; the git status is only logged
+    for file, status in changed_files.items():
+        print(f"  New or renamed file detected: {file} (git status {status})")
+        return True
     print("No new or renamed files detected.")
     return False
 
-def is_resource_removed_or_commented(changed_files, config_directory):
+def is_resource_removed_or_commented(changed_resources, latest_tag, git_objects):
     print("Checking for removed or commented resources:")
-    for file in changed_files:
-        if file.endswith('.tf') and file.startswith(config_directory):
-            old_content = subprocess.check_output(['git', 'show', f'HEAD:{file}'], stderr=subprocess.DEVNULL).decode()
-            new_content = read_file_content(file)
-            old_resources = set(parse_resource(old_content).keys())
-            new_resources = set(parse_resource(new_content).keys())
-            removed_resources = old_resources - new_resources
-            if removed_resources:
-                print(f"  Removed or commented resources in {file}: {', '.join(map(str, removed_resources))}")
-                return True
+    for file, resources in changed_resources.items():
+        old_content = git_objects.read(latest_tag, file)
+        old_resources = set(parse_resource(old_content).keys())
+        new_resources = set(resources.keys())
+        removed_resources = old_resources - new_resources
+        if removed_resources:
+            print(f"  Removed or commented resources in {file}: {', '.join(map(str, removed_resources))}")
+            return True
     print("No removed or commented resources detected.")
     return False
 
-def set_output(name, value):
+def append_github_file(env_var, values):
+    """
+    Append name=value lines to a GitHub Actions command file in a single write.
+
+    Args:
+        env_var (str): The environment variable holding the file path, e.g. GITHUB_OUTPUT.
+        values (dict): The names and values to append.
+    """
+    with open(os.environ[env_var], 'a', encoding='utf-8') as fh:
+        fh.write(''.join(f'{name}={value}\n' for name, value in values.items()))
+
+def set_outputs(outputs):
     """
-    Set a GitHub Actions output variable.
+    Set GitHub Actions output variables.
 
     Args:
-        name (str): The name of the output variable.
-        value (str): The value to set.
+        outputs (dict): The names and values of the output variables.
     """
-    with open(os.environ['GITHUB_OUTPUT'], 'a', encoding='utf-8') as fh:
-        print(f'{name}={value}', file=fh)
-    print(f"GitHub Actions output set: {name}={value}")
+    append_github_file('GITHUB_OUTPUT', outputs)
+    for name, value in outputs.items():
+        print(f"GitHub Actions output set: {name}={value}")
 
-def set_env(name, value):
+def set_env_vars(variables):
     """
-    Set a GitHub Actions environment variable.
+    Set GitHub Actions environment variables.
 
     Args:
-        name (str): The name of the environment variable.
-        value (str): The value to set.
+        variables (dict): The names and values of the environment variables.
     """
-    with open(os.environ['GITHUB_ENV'], 'a', encoding='utf-8') as fh:
-        print(f'{name}={value}', file=fh)
-    print(f"GitHub Actions environment variable set: {name}={value}")
+    append_github_file('GITHUB_ENV', variables)
+    for name, value in variables.items():
+        print(f"GitHub Actions environment variable set: {name}={value}")
 
 def main():
     """
@@ -409,9 +672,10 @@ def main():
         sys.exit(1)
 
     print(f"Analyzing Terraform configurations in: {config_directory}")
-    increment_type = determine_version_increment(config_directory)
-
     latest_tag = get_latest_tag()
+    existing_resources, config_hash = scan_directory_cached(config_directory)
+    increment_type = determine_version_increment(config_directory, latest_tag, existing_resources)
+
     if latest_tag:
         version_match = re.match(r'v(\d+)\.(\d+)\.(\d+)', latest_tag)
         if version_match:
@@ -436,14 +700,15 @@ def main():
 
     new_version = f"v{major}.{minor}.{patch}"
     
-    # Set GitHub Actions output
-    set_output('version', new_version)
+    # Set GitHub Actions outputs
+    set_outputs({'version': new_version, 'config_hash': config_hash})
     
-    # Set environment variable
-    set_env('NEW_VERSION', new_version)
+    # Set environment variables
+    set_env_vars({'NEW_VERSION': new_version, 'CONFIG_HASH': config_hash})
     
     # Print to stdout for logging purposes
     print(f"New version determined: {new_version}")
+    print(f"Generated hash: {config_hash}")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file